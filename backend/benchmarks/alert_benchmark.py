@@ -0,0 +1,111 @@
+# Alert engine benchmark
+'''
+Loads a large alert book, disconnects a batch of owners (cancelling all
+their alerts), then replays a random-walk tick stream through
+AlertService.check, reporting throughput and latency for both.
+
+Run from the backend directory:
+
+    python -m benchmarks.alert_benchmark --alerts 1000000 --ticks 200000
+'''
+
+import argparse
+import random
+import sys
+import time
+from services.alert_service import AlertService
+
+
+def build_service(alert_count: int, symbols: list, spread: float,
+                  prices: dict) -> AlertService:
+    service = AlertService()
+    for symbol, price in prices.items():
+        service.check(symbol, price)
+
+    specs = []
+    for i in range(alert_count):
+        symbol = random.choice(symbols)
+        price = prices[symbol]
+        level = round(price * (1 + random.uniform(-spread, spread)), 2)
+        # One owner per 100 alerts, roughly like a watchlist per user
+        specs.append((f"user-{i // 100}", symbol, level,
+                      "above" if level > price else "below"))
+    service.add_alerts(specs)
+    return service
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--alerts", type=int, default=1_000_000)
+    parser.add_argument("--ticks", type=int, default=200_000)
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--spread", type=float, default=0.2,
+                        help="alert levels within +/- this fraction of price")
+    parser.add_argument("--volatility", type=float, default=0.0005,
+                        help="per-tick relative price move")
+    parser.add_argument("--min-rate", type=float, default=50_000,
+                        help="fail if fewer ticks per second are processed")
+    parser.add_argument("--disconnects", type=int, default=1000,
+                        help="owners (100 alerts each) to disconnect before ticking")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    prices = {symbol: random.uniform(10, 500) for symbol in symbols}
+
+    start = time.perf_counter()
+    service = build_service(args.alerts, symbols, args.spread, prices)
+    load_time = time.perf_counter() - start
+    print(f"Loaded {service.pending_count():,} alerts in {load_time:.2f}s")
+
+    owners = random.sample(sorted(service.by_owner), min(args.disconnects, len(service.by_owner)))
+    disconnect_latencies = []
+    cancelled = 0
+    start = time.perf_counter()
+    for owner in owners:
+        owner_start = time.perf_counter()
+        cancelled += service.cancel_owner(owner)
+        disconnect_latencies.append(time.perf_counter() - owner_start)
+    elapsed = time.perf_counter() - start
+    disconnect_latencies.sort()
+    if disconnect_latencies:
+        p99 = disconnect_latencies[int(len(disconnect_latencies) * 0.99)] * 1e6
+        worst = disconnect_latencies[-1] * 1e6
+        print(f"Disconnected {len(owners):,} owners ({cancelled:,} alerts) in {elapsed:.2f}s, "
+              f"p99 {p99:.1f}us, max {worst:.1f}us per disconnect")
+
+    ticks = []
+    for i in range(args.ticks):
+        symbol = symbols[i % len(symbols)]
+        prices[symbol] *= 1 + random.gauss(0, args.volatility)
+        ticks.append((symbol, round(prices[symbol], 2), i))
+
+    latencies = []
+    fired = 0
+    check = service.check
+    clock = time.perf_counter
+    start = clock()
+    for symbol, price, timestamp in ticks:
+        tick_start = clock()
+        fired += len(check(symbol, price, timestamp))
+        latencies.append(clock() - tick_start)
+    elapsed = clock() - start
+
+    latencies.sort()
+    rate = len(ticks) / elapsed
+    p50 = latencies[len(latencies) // 2] * 1e6
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    worst = latencies[-1] * 1e6
+    print(f"Processed {len(ticks):,} ticks in {elapsed:.2f}s ({rate:,.0f} ticks/s)")
+    print(f"Per tick: p50 {p50:.1f}us, p99 {p99:.1f}us, max {worst:.1f}us")
+    print(f"Fired {fired:,} alerts, {service.pending_count():,} still pending")
+
+    if rate < args.min_rate:
+        print(f"FAIL: below {args.min_rate:,.0f} ticks/s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+# Crypto market data models
+
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+
+class CryptoBar:
+    """OHLCV bar covering one resolution bucket"""
+
+    __slots__ = ("start", "open", "high", "low", "close", "volume", "trades")
+
+    def __init__(self, start: int, price: float, volume: float):
+        self.start = start
+        self.open = price
+        self.high = price
+        self.low = price
+        self.close = price
+        self.volume = volume
+        self.trades = 1
+
+    def update(self, price: float, volume: float, late: bool = False):
+        """Fold in a trade; late trades widen the range but keep the close"""
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        if not late:
+            self.close = price
+        self.volume += volume
+        self.trades += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "time": self.start,
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "volume": self.volume,
+            "trades": self.trades
+        }
+
+
+class BarSeries:
+    """
+    Rolling window of bars for one symbol at one resolution.
+    bar_ms is the bucket size in milliseconds, max_bars caps memory.
+    """
+
+    def __init__(self, bar_ms: int, max_bars: int):
+        self.bar_ms = bar_ms
+        self.bars: Deque[CryptoBar] = deque(maxlen=max_bars)
+
+    def add_trade(self, timestamp: int, price: float, volume: float) -> CryptoBar:
+        """Fold a trade into its bucket and return the bar it landed in"""
+        start = timestamp - timestamp % self.bar_ms
+        current = self.bars[-1] if self.bars else None
+
+        if current is None or start > current.start:
+            current = CryptoBar(start, price, volume)
+            self.bars.append(current)
+        elif start == current.start:
+            current.update(price, volume)
+        else:
+            # Late trade for an older bucket, only patch it if still held
+            for bar in reversed(self.bars):
+                if bar.start == start:
+                    bar.update(price, volume, late=True)
+                    return bar
+                if bar.start < start:
+                    break
+            return current
+        return current
+
+    def latest(self) -> Optional[CryptoBar]:
+        return self.bars[-1] if self.bars else None
+
+    def to_list(self, limit: Optional[int] = None) -> List[Dict]:
+        """Bars oldest first, optionally only the latest `limit`"""
+        bars = list(self.bars)
+        if limit is not None:
+            bars = bars[-limit:]
+        return [bar.to_dict() for bar in bars]
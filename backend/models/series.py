@@ -0,0 +1,140 @@
+# Cached time series and conditional GET helpers
+
+import hashlib
+import json
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, List, Optional
+from services.market_hours import MARKET_TZ
+
+
+class CacheEntry:
+    """
+    Cached time series response and when it was fetched (epoch seconds).
+
+    `etag` is a hash of the bars and `last_modified` is when that hash
+    last changed, so refetching identical data keeps both stable.
+    `keys` holds the bar timestamps ascending for range lookups.
+    """
+
+    __slots__ = ("data", "fetched_at", "expires_at", "etag", "last_modified", "keys", "daily")
+
+    BOUND_PATTERN = re.compile(
+        r"(\d{4}-\d{2}-\d{2})(?:[T ](\d{2}:\d{2})(:\d{2})?)?(Z)?"
+    )
+
+    def __init__(self, data: Dict, fetched_at: float, expires_at: float,
+                 time_field: str, previous: Optional["CacheEntry"] = None):
+        self.data = data
+        self.fetched_at = fetched_at
+        self.expires_at = expires_at
+
+        bars = data.get("data", [])
+        body = json.dumps(bars, sort_keys=True, separators=(",", ":"))
+        self.etag = hashlib.sha1(body.encode()).hexdigest()[:20]
+        if previous is not None and previous.etag == self.etag:
+            self.last_modified = previous.last_modified
+        else:
+            self.last_modified = fetched_at
+        # Bars are stored most recent first
+        self.keys = [bar[time_field] for bar in reversed(bars)]
+        self.daily = time_field == "date"
+
+    @classmethod
+    def parse_bound(cls, value: str, daily: bool = False) -> str:
+        """
+        Normalize a query bound to the series' timestamp format.
+
+        Accepts YYYY-MM-DD[ HH:MM[:SS]] with an optional T separator and Z
+        suffix (UTC), or epoch seconds/milliseconds (at least 9 digits). Bar timestamps are
+        US/Eastern, so UTC and epoch bounds are converted. Returns a prefix
+        of the precision given, truncated to the date for daily series.
+        Raises ValueError for anything else.
+        """
+        value = value.strip()
+        # Eight digits is a compact date, not 1970; real epochs have 9+
+        if value.isdigit() and len(value) >= 9:
+            seconds = int(value)
+            if seconds > 10 ** 11:
+                seconds /= 1000
+            try:
+                moment = datetime.fromtimestamp(seconds, MARKET_TZ)
+            except (OverflowError, OSError, ValueError):
+                raise ValueError(f"Invalid timestamp bound: {value}")
+            bound = moment.strftime("%Y-%m-%d %H:%M:%S")
+        else:
+            match = cls.BOUND_PATTERN.fullmatch(value)
+            if not match:
+                raise ValueError(
+                    f"Invalid bound {value!r}, expected YYYY-MM-DD[ HH:MM[:SS]] or epoch time"
+                )
+            date, clock, secs, utc = match.groups()
+            bound = date + (f" {clock}{secs or ''}" if clock else "")
+            fmt = "%Y-%m-%d" + (" %H:%M" if clock else "") + (":%S" if secs else "")
+            try:
+                moment = datetime.strptime(bound, fmt)
+            except ValueError:
+                raise ValueError(f"Invalid bound {value!r}")
+            if utc and clock:
+                local = moment.replace(tzinfo=timezone.utc).astimezone(MARKET_TZ)
+                bound = local.strftime(fmt)
+
+        return bound[:10] if daily else bound
+
+    def slice(self, since: Optional[str] = None, start: Optional[str] = None,
+              end: Optional[str] = None) -> List[Dict]:
+        """
+        Bars within the bounds, most recent first, without copying the rest.
+        `since` and `start` are inclusive lower bounds, `end` is inclusive and
+        a prefix such as 2024-12-06 covers the whole day.
+        Raises ValueError for bounds parse_bound rejects.
+        """
+        bars = self.data.get("data", [])
+        if since is None and start is None and end is None:
+            return bars
+
+        count = len(self.keys)
+        lower = max(
+            (self.parse_bound(bound, self.daily) for bound in (since, start)
+             if bound is not None),
+            default=None
+        )
+        low = bisect_left(self.keys, lower) if lower is not None else 0
+        high = (
+            bisect_right(self.keys, self.parse_bound(end, self.daily) + "\uffff")
+            if end is not None else count
+        )
+        if low >= high:
+            return []
+        return bars[count - high:count - low]
+
+
+def series_headers(entry: CacheEntry, *bounds: Optional[str]) -> Dict[str, str]:
+    """Validators for a (possibly sliced) cached series response"""
+    etag = entry.etag
+    if any(bound is not None for bound in bounds):
+        # Each slice of the same data is a different representation
+        etag += "-" + hashlib.sha1(repr(bounds).encode()).hexdigest()[:8]
+    return {
+        "ETag": f'"{etag}"',
+        "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+        "Cache-Control": "no-cache"
+    }
+
+
+def is_not_modified(headers: Dict[str, str], if_none_match: Optional[str],
+                    if_modified_since: Optional[str]) -> bool:
+    """Evaluate conditional GET headers, If-None-Match takes precedence"""
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or headers["ETag"] in tags
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+            modified = parsedate_to_datetime(headers["Last-Modified"])
+        except (TypeError, ValueError):
+            return False
+        return modified <= since
+    return False
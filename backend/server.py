@@ -2,13 +2,19 @@
 import asyncio
 import json
 import random
+import re
+import secrets
 from datetime import datetime, timedelta
-from fastapi import FastAPI, WebSocket, HTTPException, Query
+from fastapi import FastAPI, WebSocket, HTTPException, Query, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
 import aiohttp
 from config import API_KEYS, SUPPORTED_SYMBOLS, SUPPORTED_CRYPTO
+from models.series import series_headers, is_not_modified
 from services.alpha_vantage import AlphaVantageService
 from services.finnhub_service import FinnhubService
+from services.crypto_service import CryptoService
+from services.alert_service import AlertService
+from services.prefetch_service import PrefetchScheduler
 from typing import Optional
 
 app = FastAPI()
@@ -33,13 +39,38 @@ class MarketDataManager:
     
     async def handle_finnhub_message(self, message: dict):
         """Handle incoming Finnhub WebSocket messages"""
-        if message.get("type") == "trade":
+        if message.get("type") != "trade":
+            return
+
+        trades = message.get("data") or []
+        stock_trades = []
+        crypto_trades = []
+        alert_events = []
+        for trade in trades:
+            # Every trade is checked so no crossing inside a batch is missed
+            fired = alert_service.check(trade["s"], trade["p"], trade["t"])
+            if fired:
+                alert_events.extend(fired)
+            if CryptoService.is_crypto_symbol(trade["s"]):
+                crypto_trades.append(trade)
+            else:
+                stock_trades.append(trade)
+
+        if alert_events:
+            await alert_service.notify(alert_events)
+            await sync_alert_subscriptions()
+
+        # Crypto is conflated and flushed by the crypto service's own loop
+        if crypto_trades:
+            crypto_service.handle_trades(crypto_trades)
+
+        for trade in stock_trades:
             formatted_data = {
                 "type": "price_update",
-                "symbol": message["data"][0]["s"],
-                "price": message["data"][0]["p"],
-                "timestamp": message["data"][0]["t"],
-                "volume": message["data"][0]["v"]
+                "symbol": trade["s"],
+                "price": trade["p"],
+                "timestamp": trade["t"],
+                "volume": trade["v"]
             }
             await self.broadcast(formatted_data)
     
@@ -63,6 +94,22 @@ class MarketDataManager:
             await self.disconnect_client(client)
 
 market_manager = MarketDataManager()
+crypto_service = CryptoService(SUPPORTED_CRYPTO)
+alert_service = AlertService(resolve_symbol=crypto_service.resolve_symbol)
+# Symbols the alert engine holds a Finnhub reference on
+alert_symbols = set()
+
+
+async def sync_alert_subscriptions():
+    """Hold a Finnhub reference for every symbol with pending alerts"""
+    for symbol, has_alerts in alert_service.drain_changed_symbols():
+        if has_alerts and symbol not in alert_symbols:
+            alert_symbols.add(symbol)
+            await app.state.finnhub.acquire_symbol(symbol)
+        elif not has_alerts and symbol in alert_symbols:
+            alert_symbols.discard(symbol)
+            await app.state.finnhub.release_symbol(symbol)
+
 
 # WebSocket endpoint for streaming candlestick data
 @app.websocket("/ws/candlestick-data")
@@ -116,6 +163,19 @@ async def market_data_stream(websocket: WebSocket):
 async def startup_event():
     app.state.alpha_vantage = AlphaVantageService()
     app.state.finnhub = FinnhubService()
+    app.state.crypto = crypto_service
+    app.state.alerts = alert_service
+
+    # Warm the hottest series now and refresh them as new bars land
+    app.state.prefetch = PrefetchScheduler(
+        app.state.alpha_vantage,
+        seed_symbols=SUPPORTED_SYMBOLS
+    )
+    app.state.prefetch.start()
+
+    # Crypto symbols ride the same Finnhub socket as equities
+    await crypto_service.subscribe_supported(app.state.finnhub)
+    crypto_service.start(market_manager.broadcast)
     
     # Start WebSocket connection in background
     asyncio.create_task(
@@ -151,19 +211,36 @@ async def get_stock_data(symbol: str, interval: str = "5min"):
         )
 
 @app.get("/api/stock/{symbol}/daily")
-async def get_daily_stock_data(symbol: str):
+async def get_daily_stock_data(
+    symbol: str,
+    response: Response,
+    since: Optional[str] = Query(default=None, description="Only bars on or after this date"),
+    from_: Optional[str] = Query(default=None, alias="from"),
+    to: Optional[str] = Query(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+    if_modified_since: Optional[str] = Header(default=None)
+):
     try:
         if not symbol:
             raise HTTPException(status_code=400, detail="Symbol is required")
         
         # Add await here since the method is async
-        data = await app.state.alpha_vantage.get_daily_data(symbol)
-        if not data or not data.get("data"):
+        entry = await app.state.alpha_vantage.get_daily_series(symbol)
+        if not entry.data or not entry.data.get("data"):
             raise HTTPException(
                 status_code=404,
                 detail=f"No daily data found for symbol {symbol}"
             )
-        return data
+        # Only symbols that resolved upstream count towards popularity
+        app.state.prefetch.record(symbol)
+
+        # Slice first so invalid bounds are a 400 even on a conditional request
+        bars = entry.slice(since, from_, to)
+        headers = series_headers(entry, since, from_, to)
+        if is_not_modified(headers, if_none_match, if_modified_since):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return {**entry.data, "data": bars}
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -209,6 +286,8 @@ async def search_stocks(
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await app.state.crypto.stop()
+    await app.state.prefetch.stop()
     await app.state.alpha_vantage.close_session()
     await app.state.finnhub.close_session()
 
@@ -256,18 +335,35 @@ async def get_stocks(
 @app.get("/api/stock/{symbol}/intraday")
 async def get_intraday_data(
     symbol: str,
+    response: Response,
     interval: str = Query(
         default="5min",
         enum=["1min", "5min", "15min", "30min", "60min"]
-    )
+    ),
+    since: Optional[str] = Query(
+        default=None,
+        description="Only bars at or after this timestamp; pass the newest bar you hold to also get its revisions"
+    ),
+    from_: Optional[str] = Query(default=None, alias="from"),
+    to: Optional[str] = Query(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+    if_modified_since: Optional[str] = Header(default=None)
 ):
     """Get intraday stock data with specified interval"""
     try:
         if not symbol:
             raise HTTPException(status_code=400, detail="Symbol is required")
         
-        data = await app.state.alpha_vantage.get_intraday_data(symbol, interval)
-        return data
+        entry = await app.state.alpha_vantage.get_intraday_series(symbol, interval)
+        app.state.prefetch.record(symbol, interval)
+
+        # Slice first so invalid bounds are a 400 even on a conditional request
+        bars = entry.slice(since, from_, to)
+        headers = series_headers(entry, since, from_, to)
+        if is_not_modified(headers, if_none_match, if_modified_since):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return {**entry.data, "data": bars}
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -329,32 +425,184 @@ async def get_company_news(
             detail=f"Failed to fetch company news: {str(e)}"
         )
 
+async def subscribe_live_symbol(symbol: str, held: set):
+    """Take a Finnhub reference (and crypto series) on the client's behalf"""
+    if not isinstance(symbol, str):
+        raise ValueError("Symbol must be a string")
+    crypto_symbol = app.state.crypto.resolve_symbol(symbol)
+    symbol = crypto_symbol or symbol.strip().upper()
+    if not AlertService.SYMBOL_PATTERN.fullmatch(symbol):
+        raise ValueError(f"Invalid symbol {symbol!r}")
+    if symbol in held:
+        return
+    if crypto_symbol:
+        app.state.crypto.acquire(crypto_symbol)
+    held.add(symbol)
+    await app.state.finnhub.acquire_symbol(symbol)
+
+async def release_live_symbol(symbol: str):
+    if CryptoService.is_crypto_symbol(symbol):
+        app.state.crypto.release(symbol)
+    await app.state.finnhub.release_symbol(symbol)
+
+async def unsubscribe_live_symbol(symbol: str, held: set):
+    if not isinstance(symbol, str):
+        raise ValueError("Symbol must be a string")
+    # Only what this client holds is released; others keep their references
+    symbol = app.state.crypto.resolve_symbol(symbol) or symbol.strip().upper()
+    if symbol in held:
+        held.discard(symbol)
+        await release_live_symbol(symbol)
+
 @app.websocket("/ws/live-prices")
 async def live_prices_websocket(
     websocket: WebSocket,
     symbols: str = Query(default="AAPL,MSFT,GOOGL")
 ):
     await market_manager.connect_client(websocket)
-    
-    # Subscribe to requested symbols
-    symbol_list = symbols.split(",")
-    for symbol in symbol_list:
-        await app.state.finnhub.subscribe_symbol(symbol)
+    held = set()
     
     try:
+        # Subscribe to requested symbols
+        symbol_list = symbols.split(",")
+        for symbol in symbol_list:
+            try:
+                await subscribe_live_symbol(symbol, held)
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+
         while True:
             # Keep connection alive and handle any client messages
             data = await websocket.receive_text()
             client_message = json.loads(data)
             
             # Handle subscribe/unsubscribe requests from client
-            if client_message.get("action") == "subscribe":
-                await app.state.finnhub.subscribe_symbol(client_message["symbol"])
-            elif client_message.get("action") == "unsubscribe":
-                await app.state.finnhub.unsubscribe_symbol(client_message["symbol"])
+            try:
+                if client_message.get("action") == "subscribe":
+                    await subscribe_live_symbol(client_message["symbol"], held)
+                elif client_message.get("action") == "unsubscribe":
+                    await unsubscribe_live_symbol(client_message["symbol"], held)
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
                 
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
         await market_manager.disconnect_client(websocket)
+        for symbol in held:
+            await release_live_symbol(symbol)
+
+@app.websocket("/ws/alerts")
+async def alerts_websocket(
+    websocket: WebSocket,
+    client_id: Optional[str] = Query(default=None)
+):
+    """
+    Create and cancel price alerts; triggered alerts are pushed back here.
+    Alerts live as long as the client keeps at least one connection open.
 
+    The server issues a random 128-bit client_id in `alert_session`. It is
+    a secret: passing it on another connection joins the same session,
+    and only ids of currently open sessions are accepted.
+    """
+    alerts = app.state.alerts
+    if client_id is not None and not (
+        re.fullmatch(r"[0-9a-f]{32}", client_id) and client_id in alerts.subscribers
+    ):
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    owner = client_id or secrets.token_hex(16)
+    alerts.subscribe(owner, websocket)
+    await websocket.send_json({"type": "alert_session", "client_id": owner})
+
+    try:
+        while True:
+            data = await websocket.receive_text()
+
+            try:
+                client_message = json.loads(data)
+                if not isinstance(client_message, dict):
+                    raise ValueError("Message must be a JSON object")
+                action = client_message.get("action")
+
+                if action == "create":
+                    alert = alerts.add_alert(
+                        owner,
+                        client_message["symbol"],
+                        client_message["level"],
+                        client_message.get("direction")
+                    )
+                    await sync_alert_subscriptions()
+                    await websocket.send_json({
+                        "type": "alert_created",
+                        "alert": alert.to_dict()
+                    })
+                elif action == "cancel":
+                    cancelled = alerts.cancel_alert(int(client_message["id"]), owner)
+                    await sync_alert_subscriptions()
+                    await websocket.send_json({
+                        "type": "alert_cancelled",
+                        "id": client_message["id"],
+                        "cancelled": cancelled
+                    })
+                elif action == "list":
+                    await websocket.send_json({
+                        "type": "alert_list",
+                        "alerts": alerts.list_alerts(owner)
+                    })
+            except KeyError as e:
+                await websocket.send_json({
+                    "type": "alert_error",
+                    "detail": f"Missing field {e}"
+                })
+            except (TypeError, ValueError) as e:
+                await websocket.send_json({"type": "alert_error", "detail": str(e)})
+
+    except Exception as e:
+        print(f"Alert WebSocket error: {e}")
+    finally:
+        if alerts.unsubscribe(owner, websocket):
+            alerts.cancel_owner(owner)
+            await sync_alert_subscriptions()
+
+@app.get("/api/crypto/symbols")
+async def get_crypto_symbols():
+    """List the crypto symbols being aggregated"""
+    symbols = sorted(app.state.crypto.symbols)
+    return {
+        "count": len(symbols),
+        "symbols": symbols
+    }
+
+@app.get("/api/crypto/{symbol}/candles")
+async def get_crypto_candles(
+    symbol: str,
+    resolution: str = Query(default="1m", enum=["1s", "1m"]),
+    limit: Optional[int] = Query(default=None, ge=1, le=1440)
+):
+    """Get crypto candles from the live in-memory aggregation"""
+    try:
+        return app.state.crypto.get_candles(symbol, resolution, limit)
+    except KeyError:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Crypto symbol {symbol} is not tracked"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/crypto/{symbol}/quote")
+async def get_crypto_quote(symbol: str):
+    """Get the latest trade for a crypto symbol"""
+    try:
+        quote = app.state.crypto.get_quote(symbol)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not quote:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No trades received for {symbol}"
+        )
+    return quote
@@ -0,0 +1,318 @@
+# Server-side price alerts evaluated on the live tick stream
+
+import itertools
+import math
+import re
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class Alert:
+    __slots__ = ("id", "owner", "symbol", "level", "direction")
+
+    def __init__(self, alert_id: int, owner: str, symbol: str, level: float,
+                 direction: str):
+        self.id = alert_id
+        self.owner = owner
+        self.symbol = symbol
+        self.level = level
+        self.direction = direction
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "symbol": self.symbol,
+            "level": self.level,
+            "direction": self.direction
+        }
+
+
+class LevelBook:
+    """
+    Pending levels for one side of one symbol.
+
+    Keys are kept ascending with the levels that trigger first at the tail
+    (above levels are stored negated), so a tick only has to look at the
+    last key to know whether anything fired, and firing is a tail slice.
+    Cancelled ids are tombstoned and skipped when reached; the lists are
+    compacted once tombstones make up half the book.
+    """
+
+    __slots__ = ("sign", "keys", "ids", "tombstones")
+
+    def __init__(self, sign: int):
+        self.sign = sign
+        self.keys: List[float] = []
+        self.ids: List[int] = []
+        self.tombstones: Set[int] = set()
+
+    def add(self, level: float, alert_id: int):
+        key = self.sign * level
+        index = bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.ids.insert(index, alert_id)
+
+    def extend(self, entries: List[Tuple[float, int]]):
+        """Bulk insert (level, alert_id) pairs"""
+        if len(entries) * 32 < len(self.keys):
+            # A few levels into a big book: bisecting each is cheaper
+            for level, alert_id in entries:
+                self.add(level, alert_id)
+            return
+
+        merged = list(zip(self.keys, self.ids))
+        merged.extend((self.sign * level, alert_id) for level, alert_id in entries)
+        merged.sort()
+        self.keys = [key for key, _ in merged]
+        self.ids = [alert_id for _, alert_id in merged]
+
+    def remove(self, alert_id: int):
+        """Tombstone a pending id, O(1) amortized"""
+        self.tombstones.add(alert_id)
+        if len(self.tombstones) * 2 > len(self.keys):
+            self.compact()
+
+    def compact(self):
+        dead = self.tombstones
+        live = [
+            (key, alert_id)
+            for key, alert_id in zip(self.keys, self.ids)
+            if alert_id not in dead
+        ]
+        self.keys = [key for key, _ in live]
+        self.ids = [alert_id for _, alert_id in live]
+        self.tombstones = set()
+
+    def pop_reached(self, price: float) -> List[int]:
+        """Remove and return ids of every level reached by `price`"""
+        threshold = self.sign * price
+        keys = self.keys
+        if not keys or keys[-1] < threshold:
+            return []
+        index = bisect_left(keys, threshold)
+        fired = self.ids[index:]
+        del keys[index:]
+        del self.ids[index:]
+
+        dead = self.tombstones
+        if dead:
+            live = []
+            for alert_id in fired:
+                if alert_id in dead:
+                    dead.discard(alert_id)
+                else:
+                    live.append(alert_id)
+            fired = live
+        return fired
+
+    def __len__(self) -> int:
+        return len(self.keys) - len(self.tombstones)
+
+
+class AlertService:
+    """
+    One-shot price alerts checked against every trade.
+
+    An "above" alert fires on the first tick at or above its level, a
+    "below" alert on the first tick at or below it. Each tick costs
+    O(1) when nothing fires and O(log n + k) for k fired alerts, no
+    matter how many alerts are pending. Fired alerts are removed and
+    delivered to the owner's WebSocket connections.
+
+    Symbols whose pending count goes from zero to one or back are queued
+    in `changed_symbols`; the caller drains it to acquire or release the
+    upstream subscription.
+    """
+
+    DIRECTIONS = ("above", "below")
+    SYMBOL_PATTERN = re.compile(r"[A-Z0-9][A-Z0-9.:_^=-]{0,31}")
+
+    def __init__(self, resolve_symbol: Optional[Callable[[str], Optional[str]]] = None,
+                 max_alerts_per_owner: int = 100):
+        self.resolve_symbol = resolve_symbol
+        self.max_alerts_per_owner = max_alerts_per_owner
+        self.alerts: Dict[int, Alert] = {}
+        self.books: Dict[str, Tuple[LevelBook, LevelBook]] = {}
+        self.by_owner: Dict[str, Set[int]] = {}
+        self.symbol_counts: Dict[str, int] = {}
+        self.changed_symbols: Set[str] = set()
+        self.last_prices: Dict[str, float] = {}
+        self.subscribers: Dict[str, Set] = {}
+        self._ids = itertools.count(1)
+
+    def _book(self, symbol: str) -> Tuple[LevelBook, LevelBook]:
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = (LevelBook(-1), LevelBook(1))
+        return book
+
+    def _new_alert(self, owner: str, symbol: str, level: float,
+                   direction: Optional[str]) -> Alert:
+        if not isinstance(symbol, str):
+            raise ValueError("Symbol must be a string")
+        if direction is not None and not isinstance(direction, str):
+            raise ValueError("Direction must be 'above' or 'below'")
+        if isinstance(level, bool) or not isinstance(level, (int, float, str)):
+            raise ValueError("Level must be a positive number")
+
+        symbol = symbol.strip().upper()
+        if self.resolve_symbol is not None:
+            # e.g. btcusdt -> BINANCE:BTCUSDT so it matches the tick symbol
+            symbol = self.resolve_symbol(symbol) or symbol
+        if not self.SYMBOL_PATTERN.fullmatch(symbol):
+            raise ValueError(f"Invalid symbol {symbol!r}")
+        level = float(level)
+        # NaN would break the ordering every bisect relies on
+        if not math.isfinite(level) or level <= 0:
+            raise ValueError("Level must be a positive number")
+        if len(self.by_owner.get(owner, ())) >= self.max_alerts_per_owner:
+            raise ValueError(
+                f"Alert limit reached, at most {self.max_alerts_per_owner} per client"
+            )
+        last_price = self.last_prices.get(symbol)
+        if direction is None:
+            if last_price is None:
+                raise ValueError(
+                    f"No price seen yet for {symbol}, direction must be 'above' or 'below'"
+                )
+            direction = "above" if level > last_price else "below"
+        if direction not in self.DIRECTIONS:
+            raise ValueError("Direction must be 'above' or 'below'")
+
+        alert = Alert(next(self._ids), owner, symbol, level, direction)
+        self.alerts[alert.id] = alert
+        self.by_owner.setdefault(owner, set()).add(alert.id)
+        count = self.symbol_counts.get(symbol, 0)
+        self.symbol_counts[symbol] = count + 1
+        if count == 0:
+            self.changed_symbols.add(symbol)
+        return alert
+
+    def add_alert(self, owner: str, symbol: str, level: float,
+                  direction: Optional[str] = None) -> Alert:
+        """
+        Create an alert. Without a direction it is inferred from the last
+        traded price, i.e. "notify me when the price crosses `level`".
+        """
+        alert = self._new_alert(owner, symbol, level, direction)
+        above, below = self._book(alert.symbol)
+        (above if alert.direction == "above" else below).add(alert.level, alert.id)
+        return alert
+
+    def add_alerts(self, specs: Iterable[Tuple[str, str, float, Optional[str]]]) -> List[Alert]:
+        """Bulk create (owner, symbol, level, direction) alerts, sorting each book once"""
+        alerts = []
+        try:
+            for spec in specs:
+                alerts.append(self._new_alert(*spec))
+        except (TypeError, ValueError):
+            # All or nothing, so no alert is registered without a book entry
+            for alert in alerts:
+                self._forget(alert)
+            raise
+        pending: Dict[Tuple[str, str], List[Tuple[float, int]]] = {}
+        for alert in alerts:
+            pending.setdefault((alert.symbol, alert.direction), []).append(
+                (alert.level, alert.id)
+            )
+        for (symbol, direction), entries in pending.items():
+            above, below = self._book(symbol)
+            (above if direction == "above" else below).extend(entries)
+        return alerts
+
+    def cancel_alert(self, alert_id: int, owner: Optional[str] = None) -> bool:
+        alert = self.alerts.get(alert_id)
+        if alert is None or (owner is not None and alert.owner != owner):
+            return False
+        above, below = self.books[alert.symbol]
+        (above if alert.direction == "above" else below).remove(alert.id)
+        self._forget(alert)
+        return True
+
+    def cancel_owner(self, owner: str) -> int:
+        alert_ids = list(self.by_owner.get(owner, ()))
+        for alert_id in alert_ids:
+            self.cancel_alert(alert_id)
+        return len(alert_ids)
+
+    def list_alerts(self, owner: str) -> List[Dict]:
+        return [
+            self.alerts[alert_id].to_dict()
+            for alert_id in sorted(self.by_owner.get(owner, ()))
+        ]
+
+    def _forget(self, alert: Alert):
+        del self.alerts[alert.id]
+        owned = self.by_owner.get(alert.owner)
+        if owned is not None:
+            owned.discard(alert.id)
+            if not owned:
+                del self.by_owner[alert.owner]
+
+        count = self.symbol_counts[alert.symbol] - 1
+        if count:
+            self.symbol_counts[alert.symbol] = count
+        else:
+            # Nothing live is left in the book, only tombstones
+            del self.symbol_counts[alert.symbol]
+            self.books.pop(alert.symbol, None)
+            self.changed_symbols.add(alert.symbol)
+
+    def drain_changed_symbols(self) -> List[Tuple[str, bool]]:
+        """(symbol, has_alerts) for symbols that gained or lost all alerts"""
+        changed, self.changed_symbols = self.changed_symbols, set()
+        return [(symbol, symbol in self.symbol_counts) for symbol in sorted(changed)]
+
+    def check(self, symbol: str, price: float,
+              timestamp: Optional[int] = None) -> List[Dict]:
+        """Evaluate one tick, returning the events for alerts it fired"""
+        self.last_prices[symbol] = price
+        book = self.books.get(symbol)
+        if book is None:
+            return []
+
+        above, below = book
+        fired = above.pop_reached(price)
+        fired_below = below.pop_reached(price)
+        if fired_below:
+            fired = fired + fired_below
+        if not fired:
+            return []
+
+        events = []
+        for alert_id in fired:
+            alert = self.alerts[alert_id]
+            self._forget(alert)
+            events.append({
+                "type": "alert_triggered",
+                "owner": alert.owner,
+                "alert": alert.to_dict(),
+                "price": price,
+                "timestamp": timestamp
+            })
+        return events
+
+    def pending_count(self) -> int:
+        return len(self.alerts)
+
+    def subscribe(self, owner: str, websocket):
+        self.subscribers.setdefault(owner, set()).add(websocket)
+
+    def unsubscribe(self, owner: str, websocket) -> bool:
+        """Drop a connection, returns True when it was the owner's last one"""
+        sockets = self.subscribers.get(owner)
+        if sockets is None:
+            return True
+        sockets.discard(websocket)
+        if sockets:
+            return False
+        del self.subscribers[owner]
+        return True
+
+    async def notify(self, events: List[Dict]):
+        for event in events:
+            for websocket in list(self.subscribers.get(event["owner"], ())):
+                try:
+                    await websocket.send_json(event)
+                except Exception:
+                    self.unsubscribe(event["owner"], websocket)
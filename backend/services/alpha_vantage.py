@@ -5,19 +5,121 @@
 
 # Alpha vantage service file
 
+import asyncio
+import time
 import requests
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
 from config import API_KEYS
+from models.series import CacheEntry
+from services.market_hours import next_close
 from fastapi import HTTPException
 from aiohttp import ClientSession
 
 class AlphaVantageService:
     BASE_URL = "https://www.alphavantage.co/query"
+    # How long after a bar boundary / the close new data is expected upstream
+    BAR_SETTLE = 5
+    DAILY_SETTLE = 30 * 60
+    INTERVAL_SECONDS = {
+        "1min": 60,
+        "5min": 300,
+        "15min": 900,
+        "30min": 1800,
+        "60min": 3600
+    }
     
     def __init__(self):
         self.api_key = API_KEYS["alpha_vantage"]
         self.session = None
+        self.cache: Dict[Tuple, CacheEntry] = {}
+        self.in_flight: Dict[Tuple, asyncio.Task] = {}
+        self.call_times: Deque[float] = deque()
+        self.call_day: Optional[str] = None
+        self.daily_calls = 0
+
+    @staticmethod
+    def daily_key(symbol: str) -> Tuple:
+        return ("daily", symbol.upper())
+
+    @staticmethod
+    def intraday_key(symbol: str, interval: str) -> Tuple:
+        return ("intraday", symbol.upper(), interval)
+
+    @staticmethod
+    def time_field_for(key: Tuple) -> str:
+        return "timestamp" if key[0] == "intraday" else "date"
+
+    def expiry_for(self, key: Tuple, fetched_at: float) -> float:
+        """
+        Intraday series expire when the next bar should be available and
+        daily series when the next session's bar should be, so each new
+        bar costs exactly one upstream call.
+        """
+        if key[0] == "intraday":
+            bar = self.INTERVAL_SECONDS[key[2]]
+            settled = fetched_at - self.BAR_SETTLE
+            return settled - settled % bar + bar + self.BAR_SETTLE
+        return next_close(fetched_at - self.DAILY_SETTLE) + self.DAILY_SETTLE
+
+    @staticmethod
+    def _utc_day(ts: float) -> str:
+        return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+    def record_call(self):
+        """Count one upstream request against the per-minute and daily quotas"""
+        now = time.time()
+        self.call_times.append(now)
+        day = self._utc_day(now)
+        if day != self.call_day:
+            self.call_day = day
+            self.daily_calls = 0
+        self.daily_calls += 1
+
+    def calls_today(self) -> int:
+        """Upstream requests made since midnight UTC"""
+        if self.call_day != self._utc_day(time.time()):
+            return 0
+        return self.daily_calls
+
+    def recent_calls(self, window: float = 60) -> int:
+        """Number of upstream requests made in the last `window` seconds"""
+        cutoff = time.time() - window
+        while self.call_times and self.call_times[0] < cutoff:
+            self.call_times.popleft()
+        return len(self.call_times)
+
+    async def _cached(self, key: Tuple, fetch: Callable[[], Awaitable[Dict]],
+                      force_refresh: bool = False) -> CacheEntry:
+        """
+        Serve `key` from cache while fresh, otherwise fetch it.
+        Concurrent misses for the same key share a single upstream request.
+        """
+        entry = self.cache.get(key)
+        if entry and not force_refresh and entry.expires_at > time.time():
+            return entry
+
+        task = self.in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(key, fetch))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        # Shield so one disconnecting client doesn't cancel the shared fetch
+        return await asyncio.shield(task)
+
+    async def _refresh(self, key: Tuple, fetch: Callable[[], Awaitable[Dict]]) -> CacheEntry:
+        data = await fetch()
+        fetched_at = time.time()
+        entry = CacheEntry(
+            data,
+            fetched_at,
+            self.expiry_for(key, fetched_at),
+            self.time_field_for(key),
+            self.cache.get(key)
+        )
+        self.cache[key] = entry
+        return entry
        
     async def close_session(self):
         """Close the aiohttp client session"""
@@ -25,7 +127,20 @@ class AlphaVantageService:
             await self.session.close()
             self.session = None
 
-    async def get_daily_data(self, symbol: str) -> Dict:
+    async def get_daily_data(self, symbol: str, force_refresh: bool = False) -> Dict:
+        """Daily stock data, served from cache while fresh"""
+        entry = await self.get_daily_series(symbol, force_refresh)
+        return entry.data
+
+    async def get_daily_series(self, symbol: str, force_refresh: bool = False) -> CacheEntry:
+        """Cache entry for daily data, for range and conditional queries"""
+        return await self._cached(
+            self.daily_key(symbol),
+            lambda: self._fetch_daily_data(symbol),
+            force_refresh
+        )
+
+    async def _fetch_daily_data(self, symbol: str) -> Dict:
         """Fetch daily stock data using aiohttp"""
         if not self.session:
             self.session = ClientSession()
@@ -37,6 +152,7 @@ class AlphaVantageService:
                 "apikey": self.api_key
             }
             
+            self.record_call()
             async with self.session.get(self.BASE_URL, params=params, ssl=False) as response:
                 data = await response.json()
                 
@@ -92,6 +208,7 @@ class AlphaVantageService:
                 "apikey": self.api_key
             }
             
+            self.record_call()
             async with self.session.get(self.BASE_URL, params=params, ssl=False) as response:
                 data = await response.json()
                 
@@ -138,6 +255,7 @@ class AlphaVantageService:
                 "apikey": self.api_key
             }
             
+            self.record_call()
             async with self.session.get(self.BASE_URL, params=params, ssl=False) as response:
                 data = await response.json()
                 
@@ -168,11 +286,28 @@ class AlphaVantageService:
                 detail=f"Failed to fetch stock listings: {str(e)}"
             )
     
-    async def get_intraday_data(self, symbol: str, interval: str = "5min") -> Dict:
+    async def get_intraday_data(self, symbol: str, interval: str = "5min",
+                                force_refresh: bool = False) -> Dict:
         """
-        Fetch intraday stock data
+        Intraday stock data, served from cache for one bar interval
         interval options: 1min, 5min, 15min, 30min, 60min
         """
+        entry = await self.get_intraday_series(symbol, interval, force_refresh)
+        return entry.data
+
+    async def get_intraday_series(self, symbol: str, interval: str = "5min",
+                                  force_refresh: bool = False) -> CacheEntry:
+        """Cache entry for intraday data, for range and conditional queries"""
+        if interval not in self.INTERVAL_SECONDS:
+            raise ValueError(f"Invalid interval {interval}")
+        return await self._cached(
+            self.intraday_key(symbol, interval),
+            lambda: self._fetch_intraday_data(symbol, interval),
+            force_refresh
+        )
+
+    async def _fetch_intraday_data(self, symbol: str, interval: str) -> Dict:
+        """Fetch intraday stock data from Alpha Vantage"""
         if not self.session:
             self.session = ClientSession()
         
@@ -185,6 +320,7 @@ class AlphaVantageService:
                 "outputsize": "compact"  # Returns latest 100 data points
             }
             
+            self.record_call()
             async with self.session.get(self.BASE_URL, params=params, ssl=False) as response:
                 data = await response.json()
                 
@@ -220,7 +356,8 @@ class AlphaVantageService:
                 return {
                     "symbol": symbol,
                     "interval": interval,
-                    "lastUpdated": datetime.now().isoformat(),
+                    # Latest bar rather than wall clock, so identical data serializes identically
+                    "lastUpdated": formatted_data[0]["timestamp"],
                     "data": formatted_data
                 }
                 
@@ -0,0 +1,216 @@
+# Crypto market data service
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from models.crypto import BarSeries
+
+
+class CryptoService:
+    """
+    Aggregates high rate crypto trades from the Finnhub socket.
+
+    Trades are folded into 1s and 1m bars as they arrive, but only the
+    latest state per symbol is kept for fan-out. A flush loop broadcasts
+    the conflated updates every `flush_interval` seconds, so a burst of
+    hundreds of trades turns into a single message per symbol.
+
+    Supported symbols are always tracked. Clients may add up to
+    `max_extra_symbols` more; those are reference counted and their bars
+    are freed once the last client releases them.
+    """
+
+    DEFAULT_EXCHANGE = "BINANCE"
+    RESOLUTIONS = {"1s": 1000, "1m": 60_000}
+    MAX_BARS = {"1s": 600, "1m": 1440}  # 10 minutes of seconds, a day of minutes
+
+    def __init__(self, supported: Optional[List[str]] = None,
+                 max_extra_symbols: int = 20,
+                 flush_interval: float = 0.25):
+        self.flush_interval = flush_interval
+        self.max_extra_symbols = max_extra_symbols
+        self.symbols: Set[str] = set()
+        self.series: Dict[str, Dict[str, BarSeries]] = {}
+        self.last_trade: Dict[str, Dict] = {}
+        self.pending: Dict[str, Dict] = {}
+        self.refcounts: Dict[str, int] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.pinned: Set[str] = {self.normalize_symbol(symbol) for symbol in supported or []}
+        for symbol in self.pinned:
+            self._create_series(symbol)
+
+    @classmethod
+    def normalize_symbol(cls, symbol: str) -> str:
+        """Return an exchange prefixed symbol, e.g. btcusdt -> BINANCE:BTCUSDT"""
+        symbol = symbol.strip().upper()
+        if not symbol:
+            raise ValueError("Symbol is required")
+        if ":" not in symbol:
+            symbol = f"{cls.DEFAULT_EXCHANGE}:{symbol}"
+        return symbol
+
+    @staticmethod
+    def is_crypto_symbol(symbol: str) -> bool:
+        return ":" in symbol
+
+    def resolve_symbol(self, symbol: str) -> Optional[str]:
+        """
+        The crypto symbol a client string refers to, or None for equities.
+        Unprefixed symbols only resolve when their BINANCE: form is tracked,
+        so btcusdt works for a supported pair while AAPL stays a stock.
+        """
+        symbol = symbol.strip().upper()
+        if not symbol:
+            return None
+        if self.is_crypto_symbol(symbol):
+            return symbol
+        prefixed = f"{self.DEFAULT_EXCHANGE}:{symbol}"
+        return prefixed if prefixed in self.series else None
+
+    def _create_series(self, symbol: str):
+        self.series[symbol] = {
+            resolution: BarSeries(bar_ms, self.MAX_BARS[resolution])
+            for resolution, bar_ms in self.RESOLUTIONS.items()
+        }
+        self.symbols.add(symbol)
+
+    def acquire(self, symbol: str) -> str:
+        """
+        Start tracking a symbol on behalf of one client.
+        Raises ValueError once the extra symbol cap is reached.
+        """
+        symbol = self.normalize_symbol(symbol)
+        if symbol in self.pinned:
+            return symbol
+        if symbol not in self.series:
+            if len(self.refcounts) >= self.max_extra_symbols:
+                raise ValueError(
+                    f"Too many crypto symbols tracked, limit is {self.max_extra_symbols}"
+                )
+            self._create_series(symbol)
+        self.refcounts[symbol] = self.refcounts.get(symbol, 0) + 1
+        return symbol
+
+    def release(self, symbol: str) -> bool:
+        """Drop one client's reference, returns True if the series was freed"""
+        symbol = self.normalize_symbol(symbol)
+        count = self.refcounts.get(symbol)
+        if count is None:
+            return False
+        if count > 1:
+            self.refcounts[symbol] = count - 1
+            return False
+
+        del self.refcounts[symbol]
+        del self.series[symbol]
+        self.symbols.discard(symbol)
+        self.pending.pop(symbol, None)
+        self.last_trade.pop(symbol, None)
+        return True
+
+    async def subscribe_supported(self, finnhub):
+        """Hold the supported symbols on the shared Finnhub socket for good"""
+        for symbol in sorted(self.pinned):
+            await finnhub.acquire_symbol(symbol)
+
+    def handle_trades(self, trades: List[Dict]):
+        """
+        Fold a batch of Finnhub trades into bars.
+        Runs synchronously over the whole batch; nothing is broadcast here.
+        """
+        series = self.series
+        pending = self.pending
+        for trade in trades:
+            symbol = trade["s"]
+            symbol_series = series.get(symbol)
+            if symbol_series is None:
+                continue
+
+            price = trade["p"]
+            volume = trade["v"]
+            timestamp = trade["t"]
+            for bars in symbol_series.values():
+                bars.add_trade(timestamp, price, volume)
+
+            update = pending.get(symbol)
+            if update is None:
+                pending[symbol] = {
+                    "symbol": symbol,
+                    "price": price,
+                    "timestamp": timestamp,
+                    "volume": volume,
+                    "trades": 1
+                }
+            else:
+                update["price"] = price
+                update["timestamp"] = timestamp
+                update["volume"] += volume
+                update["trades"] += 1
+
+    def drain_updates(self) -> List[Dict]:
+        """Return the conflated updates since the last drain"""
+        if not self.pending:
+            return []
+
+        pending, self.pending = self.pending, {}
+        updates = []
+        for symbol, update in pending.items():
+            self.last_trade[symbol] = update
+            symbol_series = self.series[symbol]
+            updates.append({
+                "type": "crypto_update",
+                **update,
+                "bars": {
+                    resolution: bars.latest().to_dict()
+                    for resolution, bars in symbol_series.items()
+                    if bars.latest() is not None
+                }
+            })
+        return updates
+
+    def start(self, broadcast: Callable[[Dict], Awaitable[None]]):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop(broadcast))
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+
+    async def _flush_loop(self, broadcast: Callable[[Dict], Awaitable[None]]):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                for update in self.drain_updates():
+                    await broadcast(update)
+            except Exception as e:
+                print(f"Error flushing crypto updates: {e}")
+
+    def get_candles(self, symbol: str, resolution: str = "1m",
+                    limit: Optional[int] = None) -> Dict:
+        """Candles for a tracked symbol, oldest first"""
+        symbol = self.normalize_symbol(symbol)
+        if resolution not in self.RESOLUTIONS:
+            raise ValueError(
+                f"Invalid resolution. Must be one of: {', '.join(self.RESOLUTIONS)}"
+            )
+        if symbol not in self.series:
+            raise KeyError(symbol)
+
+        candles = self.series[symbol][resolution].to_list(limit)
+        return {
+            "symbol": symbol,
+            "resolution": resolution,
+            "count": len(candles),
+            "data": candles
+        }
+
+    def get_quote(self, symbol: str) -> Optional[Dict]:
+        """Latest trade for a symbol, including trades not yet flushed"""
+        symbol = self.normalize_symbol(symbol)
+        quote = self.pending.get(symbol) or self.last_trade.get(symbol)
+        return dict(quote) if quote else None
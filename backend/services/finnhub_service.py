@@ -16,6 +16,7 @@ class FinnhubService:
         self.session: Optional[aiohttp.ClientSession] = None
         self.ws_connection = None
         self.subscribed_symbols: Set[str] = set()
+        self.symbol_refs: Dict[str, int] = {}
         self.message_callback: Optional[Callable] = None
     
     async def init_session(self):
@@ -102,7 +103,7 @@ class FinnhubService:
                     self.ws_connection = websocket
                     
                     # Resubscribe to any previously subscribed symbols
-                    for symbol in self.subscribed_symbols:
+                    for symbol in list(self.subscribed_symbols):
                         await self.subscribe_symbol(symbol)
                     
                     while True:
@@ -117,14 +118,17 @@ class FinnhubService:
                 await asyncio.sleep(5)  # Wait before reconnecting
     
     async def subscribe_symbol(self, symbol: str):
-        """Subscribe to real-time price updates for a symbol"""
+        """
+        Subscribe to real-time price updates for a symbol.
+        Symbols subscribed before the socket is up are sent on connect.
+        """
+        self.subscribed_symbols.add(symbol)
         if self.ws_connection:
             subscribe_message = {
                 "type": "subscribe",
                 "symbol": symbol
             }
             await self.ws_connection.send(json.dumps(subscribe_message))
-            self.subscribed_symbols.add(symbol)
     
     async def unsubscribe_symbol(self, symbol: str):
         """Unsubscribe from a symbol's updates"""
@@ -134,4 +138,25 @@ class FinnhubService:
                 "symbol": symbol
             }
             await self.ws_connection.send(json.dumps(unsubscribe_message))
-            self.subscribed_symbols.remove(symbol)
+        self.subscribed_symbols.discard(symbol)
+
+    async def acquire_symbol(self, symbol: str):
+        """
+        Take a reference on a symbol's subscription, subscribing on the first.
+        Live prices, crypto and alerts share the socket, so they go through
+        acquire/release rather than unsubscribing outright.
+        """
+        count = self.symbol_refs.get(symbol, 0)
+        self.symbol_refs[symbol] = count + 1
+        if count == 0:
+            await self.subscribe_symbol(symbol)
+
+    async def release_symbol(self, symbol: str):
+        """Drop a reference, unsubscribing once nobody holds the symbol"""
+        count = self.symbol_refs.get(symbol, 0)
+        if count <= 1:
+            self.symbol_refs.pop(symbol, None)
+            if count == 1:
+                await self.unsubscribe_symbol(symbol)
+        else:
+            self.symbol_refs[symbol] = count - 1
@@ -0,0 +1,38 @@
+# US equity market calendar helpers
+
+from datetime import datetime, time as dt_time, timedelta
+from zoneinfo import ZoneInfo
+
+MARKET_TZ = ZoneInfo("America/New_York")
+MARKET_OPEN = dt_time(9, 30)
+MARKET_CLOSE = dt_time(16, 0)
+
+# Exchange holidays are not modelled; on those days the scheduler simply
+# finds nothing new upstream.
+
+
+def _local(ts: float) -> datetime:
+    return datetime.fromtimestamp(ts, MARKET_TZ)
+
+
+def is_market_open(ts: float, grace: float = 0) -> bool:
+    """True during regular hours, extended by `grace` seconds past the close"""
+    local = _local(ts)
+    if local.weekday() >= 5:
+        return False
+    opens = local.replace(hour=MARKET_OPEN.hour, minute=MARKET_OPEN.minute,
+                          second=0, microsecond=0)
+    closes = local.replace(hour=MARKET_CLOSE.hour, minute=MARKET_CLOSE.minute,
+                           second=0, microsecond=0)
+    return opens <= local < closes + timedelta(seconds=grace)
+
+
+def next_close(ts: float) -> float:
+    """Epoch seconds of the first regular session close after `ts`"""
+    local = _local(ts)
+    day = local.date()
+    close = datetime.combine(day, MARKET_CLOSE, MARKET_TZ)
+    while close <= local or close.weekday() >= 5:
+        day += timedelta(days=1)
+        close = datetime.combine(day, MARKET_CLOSE, MARKET_TZ)
+    return close.timestamp()
@@ -0,0 +1,206 @@
+# Popularity driven prefetch and cache warming
+
+import asyncio
+import math
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from services.alpha_vantage import AlphaVantageService
+from services.market_hours import is_market_open
+
+
+class SymbolStats:
+    """Request popularity for one symbol, decayed so recent hits count more"""
+
+    __slots__ = ("score", "last_seen", "intervals")
+
+    def __init__(self, now: float):
+        self.score = 0.0
+        self.last_seen = now
+        self.intervals: Set[str] = set()
+
+    def decayed_score(self, now: float, half_life: float) -> float:
+        return self.score * math.pow(0.5, max(0.0, now - self.last_seen) / half_life)
+
+
+class PrefetchScheduler:
+    """
+    Keeps the hottest symbols' daily and intraday series warm.
+
+    Every tick the scheduler ranks symbols by decayed request count and
+    refreshes any of their series that are missing or expired. Cache
+    entries expire just after the next bar is due upstream, so this is
+    one call per intraday bar and one daily call per trading day.
+    Intraday series are left alone outside market hours.
+
+    Refreshes stop once upstream calls (by users and the scheduler) reach
+    `quota_per_minute - reserve` in the last minute or
+    `daily_quota - daily_reserve` today, so user traffic keeps headroom.
+    The first tick runs immediately, which warms the cache at startup.
+
+    Only symbols that fetched successfully should be recorded. Non-seed
+    symbols whose score decays below `min_score` are pruned, and at most
+    `max_tracked` are kept.
+    """
+
+    DEFAULT_INTERVAL = "5min"
+
+    def __init__(self, alpha_vantage: AlphaVantageService,
+                 seed_symbols: Optional[List[str]] = None,
+                 quota_per_minute: int = 5,
+                 reserve: int = 1,
+                 daily_quota: int = 25,
+                 daily_reserve: int = 10,
+                 max_symbols: int = 10,
+                 tick: float = 5.0,
+                 half_life: float = 30 * 60,
+                 retry_after: float = 5 * 60,
+                 min_score: float = 0.05,
+                 max_tracked: int = 500):
+        self.alpha_vantage = alpha_vantage
+        self.quota_per_minute = quota_per_minute
+        self.reserve = reserve
+        self.daily_quota = daily_quota
+        self.daily_reserve = daily_reserve
+        self.max_symbols = max_symbols
+        self.tick = tick
+        self.half_life = half_life
+        self.retry_after = retry_after
+        self.min_score = min_score
+        self.max_tracked = max_tracked
+        self.failed_until: Dict[Tuple, float] = {}
+        self.stats: Dict[str, SymbolStats] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.seeds: Set[str] = {symbol.upper() for symbol in seed_symbols or []}
+        for symbol in self.seeds:
+            self.record(symbol, self.DEFAULT_INTERVAL)
+
+    def record(self, symbol: str, interval: Optional[str] = None):
+        """Count a request for `symbol`, optionally for an intraday interval"""
+        now = time.time()
+        symbol = symbol.upper()
+        stats = self.stats.get(symbol)
+        if stats is None:
+            stats = self.stats[symbol] = SymbolStats(now)
+        stats.score = stats.decayed_score(now, self.half_life) + 1
+        stats.last_seen = now
+        if interval in self.alpha_vantage.INTERVAL_SECONDS:
+            stats.intervals.add(interval)
+
+        if len(self.stats) > self.max_tracked:
+            self.prune(now)
+
+    def prune(self, now: Optional[float] = None):
+        """Drop faded non-seed symbols, then the coldest beyond `max_tracked`"""
+        now = now or time.time()
+        scores = {
+            symbol: stats.decayed_score(now, self.half_life)
+            for symbol, stats in self.stats.items()
+        }
+        for symbol, score in scores.items():
+            if score < self.min_score and symbol not in self.seeds:
+                del self.stats[symbol]
+
+        overflow = len(self.stats) - self.max_tracked
+        if overflow > 0:
+            coldest = sorted(
+                (symbol for symbol in self.stats if symbol not in self.seeds),
+                key=scores.__getitem__
+            )
+            for symbol in coldest[:overflow]:
+                del self.stats[symbol]
+
+        self.failed_until = {
+            key: until for key, until in self.failed_until.items() if until > now
+        }
+
+    def hottest(self, now: Optional[float] = None) -> List[Tuple[str, float]]:
+        now = now or time.time()
+        ranked = sorted(
+            ((symbol, stats.decayed_score(now, self.half_life))
+             for symbol, stats in self.stats.items()),
+            key=lambda item: item[1],
+            reverse=True
+        )
+        return ranked[:self.max_symbols]
+
+    def is_due(self, key: Tuple, now: float) -> bool:
+        if self.failed_until.get(key, 0) > now:
+            return False
+        if key[0] == "intraday":
+            bar = self.alpha_vantage.INTERVAL_SECONDS.get(key[2])
+            if bar is None:
+                return False
+            # Allow one bar past the close so the closing bar is picked up
+            if not is_market_open(now, bar + self.alpha_vantage.BAR_SETTLE):
+                return False
+        entry = self.alpha_vantage.cache.get(key)
+        return entry is None or entry.expires_at <= now
+
+    def due_refreshes(self, now: Optional[float] = None) -> List[Tuple[str, Tuple]]:
+        """(symbol, cache key) pairs to refresh, hottest and soonest first"""
+        now = now or time.time()
+        due = []
+        for rank, (symbol, _) in enumerate(self.hottest(now)):
+            keys = [self.alpha_vantage.daily_key(symbol)]
+            keys += [
+                self.alpha_vantage.intraday_key(symbol, interval)
+                for interval in sorted(self.stats[symbol].intervals)
+            ]
+            for key in keys:
+                if self.is_due(key, now):
+                    entry = self.alpha_vantage.cache.get(key)
+                    expires_at = entry.expires_at if entry else 0
+                    due.append((rank, expires_at, symbol, key))
+        due.sort(key=lambda item: (item[0], item[1]))
+        return [(symbol, key) for _, _, symbol, key in due]
+
+    def budget(self) -> int:
+        minute_left = self.quota_per_minute - self.reserve - self.alpha_vantage.recent_calls(60)
+        day_left = self.daily_quota - self.daily_reserve - self.alpha_vantage.calls_today()
+        return max(0, min(minute_left, day_left))
+
+    async def run_once(self) -> int:
+        """Refresh due series within the quota budget, returns calls made"""
+        self.prune()
+        calls = 0
+        for symbol, key in self.due_refreshes():
+            if self.budget() <= 0:
+                break
+            # Skip if a user request is already fetching this key
+            if key in self.alpha_vantage.in_flight:
+                continue
+            try:
+                if key[0] == "daily":
+                    await self.alpha_vantage.get_daily_data(symbol, force_refresh=True)
+                else:
+                    await self.alpha_vantage.get_intraday_data(
+                        symbol, key[2], force_refresh=True
+                    )
+            except Exception as e:
+                # Back off so a bad symbol doesn't eat the quota every tick
+                self.failed_until[key] = time.time() + self.retry_after
+                print(f"Error prefetching {key}: {e}")
+            calls += 1
+        return calls
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Prefetch scheduler error: {e}")
+            await asyncio.sleep(self.tick)
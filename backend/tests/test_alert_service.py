@@ -0,0 +1,136 @@
+import pytest
+from services.alert_service import AlertService, LevelBook
+from services.crypto_service import CryptoService
+
+
+def test_nan_level_is_rejected():
+    service = AlertService()
+    with pytest.raises(ValueError):
+        service.add_alert("owner", "AAPL", "nan", "above")
+    assert service.pending_count() == 0
+
+
+@pytest.mark.parametrize("level", ["inf", "-inf", 0, -5])
+def test_non_positive_or_infinite_level_is_rejected(level):
+    service = AlertService()
+    with pytest.raises(ValueError):
+        service.add_alert("owner", "AAPL", level, "below")
+
+
+def test_cancelled_alert_does_not_fire():
+    service = AlertService()
+    service.check("AAPL", 100.0)
+    kept = service.add_alert("a", "AAPL", 105)
+    cancelled = service.add_alert("b", "AAPL", 104)
+    assert service.cancel_owner("b") == 1
+
+    events = service.check("AAPL", 110.0)
+    assert [event["alert"]["id"] for event in events] == [kept.id]
+    assert service.pending_count() == 0
+    assert cancelled.id not in service.alerts
+
+
+@pytest.mark.parametrize("symbol, level, direction", [
+    (123, 5, None),
+    (None, 5, "above"),
+    ("AAPL", 5, 1),
+    ("AAPL", True, "above"),
+    ("AAPL", [5], "above"),
+    ("", 5, "above"),
+    ("AAPL; DROP", 5, "above"),
+])
+def test_malformed_alerts_raise_value_error(symbol, level, direction):
+    service = AlertService()
+    with pytest.raises(ValueError):
+        service.add_alert("user", symbol, level, direction)
+    assert service.pending_count() == 0
+    assert service.drain_changed_symbols() == []
+
+
+def test_alerts_fire_at_the_level_inclusive():
+    service = AlertService()
+    above = service.add_alert("user", "AAPL", 100.0, "above")
+    below = service.add_alert("user", "AAPL", 90.0, "below")
+
+    assert service.check("AAPL", 99.99) == []
+    assert service.check("AAPL", 90.01) == []
+    fired = service.check("AAPL", 100.0)
+    assert [event["alert"]["id"] for event in fired] == [above.id]
+    fired = service.check("AAPL", 90.0)
+    assert [event["alert"]["id"] for event in fired] == [below.id]
+    assert service.pending_count() == 0
+
+
+def test_one_tick_fires_both_sides():
+    service = AlertService()
+    above = service.add_alert("user", "AAPL", 100.0, "above")
+    below = service.add_alert("user", "AAPL", 110.0, "below")
+    service.add_alert("user", "AAPL", 120.0, "above")
+
+    fired = service.check("AAPL", 105.0)
+    assert sorted(event["alert"]["id"] for event in fired) == [above.id, below.id]
+    assert service.pending_count() == 1
+
+
+def test_extend_merges_into_existing_book():
+    book = LevelBook(1)
+    for alert_id, level in enumerate([10.0, 30.0, 50.0]):
+        book.add(level, alert_id)
+    book.extend([(40.0, 3), (20.0, 4), (60.0, 5)])
+
+    assert book.keys == [10.0, 20.0, 30.0, 40.0, 50.0, 60.0]
+    assert book.ids == [0, 4, 1, 3, 2, 5]
+    assert book.pop_reached(35.0) == [3, 2, 5]
+
+
+def test_compact_runs_once_tombstones_pass_half():
+    book = LevelBook(-1)
+    for alert_id in range(4):
+        book.add(100.0 + alert_id, alert_id)
+
+    book.remove(0)
+    book.remove(1)
+    assert book.tombstones == {0, 1} and len(book.keys) == 4
+    book.remove(2)
+    assert book.tombstones == set()
+    assert book.ids == [3] and len(book) == 1
+
+
+def test_crypto_alert_symbols_are_resolved():
+    crypto = CryptoService(["BINANCE:BTCUSDT"])
+    service = AlertService(resolve_symbol=crypto.resolve_symbol)
+    alert = service.add_alert("user", "btcusdt", 50000, "above")
+
+    assert alert.symbol == "BINANCE:BTCUSDT"
+    assert service.check("BINANCE:BTCUSDT", 50001)
+
+
+def test_alerts_are_capped_per_owner():
+    service = AlertService(max_alerts_per_owner=2)
+    service.add_alert("user", "AAPL", 1, "above")
+    service.add_alert("user", "AAPL", 2, "above")
+    with pytest.raises(ValueError):
+        service.add_alert("user", "AAPL", 3, "above")
+    service.add_alert("other", "AAPL", 3, "above")
+
+
+def test_changed_symbols_track_first_and_last_alert():
+    service = AlertService()
+    first = service.add_alert("user", "AAPL", 100.0, "above")
+    second = service.add_alert("user", "AAPL", 110.0, "above")
+    assert service.drain_changed_symbols() == [("AAPL", True)]
+
+    service.cancel_alert(first.id)
+    assert service.drain_changed_symbols() == []
+    service.check("AAPL", 120.0)
+    assert service.drain_changed_symbols() == [("AAPL", False)]
+    assert "AAPL" not in service.books
+    assert second.id not in service.alerts
+
+
+def test_bulk_add_is_all_or_nothing():
+    service = AlertService()
+    with pytest.raises(ValueError):
+        service.add_alerts([("user", "AAPL", 100.0, "above"), ("user", "MSFT", -1, "above")])
+    assert service.pending_count() == 0
+    assert service.symbol_counts == {} and service.by_owner == {}
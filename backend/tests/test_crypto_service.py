@@ -0,0 +1,84 @@
+import pytest
+from models.crypto import BarSeries
+from services.crypto_service import CryptoService
+
+
+def trade(symbol, price, volume, timestamp):
+    return {"s": symbol, "p": price, "v": volume, "t": timestamp}
+
+
+def test_bar_rolls_over_at_bucket_boundary():
+    series = BarSeries(bar_ms=1000, max_bars=10)
+    series.add_trade(1000, 10.0, 1)
+    series.add_trade(1999, 12.0, 2)
+    series.add_trade(2000, 11.0, 1)
+
+    bars = series.to_list()
+    assert [bar["time"] for bar in bars] == [1000, 2000]
+    assert bars[0]["high"] == 12.0 and bars[0]["close"] == 12.0
+    assert bars[0]["volume"] == 3 and bars[0]["trades"] == 2
+    assert bars[1]["open"] == 11.0
+
+
+def test_late_trade_updates_older_bucket_still_held():
+    series = BarSeries(bar_ms=1000, max_bars=10)
+    series.add_trade(1000, 10.0, 1)
+    series.add_trade(2000, 11.0, 1)
+    bar = series.add_trade(1500, 9.0, 4)
+
+    assert bar.start == 1000
+    first, second = series.to_list()
+    assert first["low"] == 9.0 and first["volume"] == 5
+    assert first["close"] == 10.0
+    assert second["volume"] == 1 and second["trades"] == 1
+
+
+def test_late_trade_for_evicted_bucket_is_dropped():
+    series = BarSeries(bar_ms=1000, max_bars=2)
+    for timestamp in (1000, 2000, 3000):
+        series.add_trade(timestamp, 10.0, 1)
+    series.add_trade(1500, 1.0, 1)
+
+    assert [bar["low"] for bar in series.to_list()] == [10.0, 10.0]
+
+
+def test_trades_are_conflated_into_one_update_per_symbol():
+    service = CryptoService(["BINANCE:BTCUSDT", "BINANCE:ETHUSDT"])
+    service.handle_trades([
+        trade("BINANCE:BTCUSDT", 100.0, 1, 1000),
+        trade("BINANCE:ETHUSDT", 10.0, 5, 1100),
+        trade("BINANCE:BTCUSDT", 101.0, 2, 1200),
+        trade("BINANCE:XRPUSDT", 1.0, 1, 1300),
+    ])
+
+    updates = {update["symbol"]: update for update in service.drain_updates()}
+    assert set(updates) == {"BINANCE:BTCUSDT", "BINANCE:ETHUSDT"}
+    btc = updates["BINANCE:BTCUSDT"]
+    assert btc["price"] == 101.0 and btc["volume"] == 3 and btc["trades"] == 2
+    assert btc["bars"]["1s"]["open"] == 100.0 and btc["bars"]["1s"]["close"] == 101.0
+    assert service.drain_updates() == []
+
+
+def test_acquire_release_refcounts_extra_symbols():
+    service = CryptoService(["BINANCE:BTCUSDT"], max_extra_symbols=1)
+
+    assert service.acquire("btcusdt") == "BINANCE:BTCUSDT"
+    assert service.release("BINANCE:BTCUSDT") is False  # pinned
+
+    symbol = service.acquire("binance:ethusdt")
+    service.acquire(symbol)
+    with pytest.raises(ValueError):
+        service.acquire("BINANCE:SOLUSDT")
+
+    assert service.release(symbol) is False
+    assert symbol in service.series
+    assert service.release(symbol) is True
+    assert symbol not in service.series
+    assert service.acquire("BINANCE:SOLUSDT") == "BINANCE:SOLUSDT"
+
+
+def test_resolve_symbol_only_prefixes_tracked_pairs():
+    service = CryptoService(["BINANCE:BTCUSDT"])
+    assert service.resolve_symbol("btcusdt") == "BINANCE:BTCUSDT"
+    assert service.resolve_symbol("AAPL") is None
+    assert service.resolve_symbol("coinbase:btc-usd") == "COINBASE:BTC-USD"
@@ -0,0 +1,99 @@
+import pytest
+from models.series import CacheEntry, is_not_modified, series_headers
+
+
+def intraday_entry():
+    # Alpha Vantage order, most recent first
+    bars = [
+        {"timestamp": f"2024-12-06 {clock}", "close": close}
+        for clock, close in (("10:00:00", 3.0), ("09:45:00", 2.0), ("09:30:00", 1.0))
+    ]
+    bars.append({"timestamp": "2024-12-05 15:55:00", "close": 0.5})
+    return CacheEntry({"data": bars}, 1000.0, 2000.0, "timestamp")
+
+
+def daily_entry():
+    bars = [{"date": f"2024-12-{day:02d}", "close": day} for day in (6, 5, 4, 3)]
+    return CacheEntry({"data": bars}, 1000.0, 2000.0, "date")
+
+
+@pytest.mark.parametrize("value, daily, expected", [
+    ("2024-12-06", False, "2024-12-06"),
+    ("2024-12-06 09:30", False, "2024-12-06 09:30"),
+    ("2024-12-06T09:30:15", False, "2024-12-06 09:30:15"),
+    ("2024-12-06T14:30:00Z", False, "2024-12-06 09:30:00"),
+    ("2024-07-01T13:30Z", False, "2024-07-01 09:30"),
+    ("1733495400", False, "2024-12-06 09:30:00"),
+    ("1733495400000", False, "2024-12-06 09:30:00"),
+    ("2024-12-06T14:30:00Z", True, "2024-12-06"),
+])
+def test_parse_bound_normalizes_to_eastern(value, daily, expected):
+    assert CacheEntry.parse_bound(value, daily) == expected
+
+
+@pytest.mark.parametrize("value", [
+    "20241206", "12345678", "2024-13-01", "2024-12-06 25:00", "yesterday", "",
+])
+def test_parse_bound_rejects_bad_values(value):
+    with pytest.raises(ValueError):
+        CacheEntry.parse_bound(value)
+
+
+def closes(bars):
+    return [bar["close"] for bar in bars]
+
+
+def test_slice_bounds_are_inclusive():
+    entry = intraday_entry()
+
+    assert closes(entry.slice()) == [3.0, 2.0, 1.0, 0.5]
+    assert closes(entry.slice(since="2024-12-06 09:45:00")) == [3.0, 2.0]
+    assert closes(entry.slice(start="2024-12-06 09:30", end="2024-12-06 09:45")) == [2.0, 1.0]
+    assert closes(entry.slice(end="2024-12-05")) == [0.5]
+    assert closes(entry.slice(since="2024-12-06", start="2024-12-06 09:45")) == [3.0, 2.0]
+    assert closes(entry.slice(since="2024-12-06T14:45:00Z")) == [3.0, 2.0]
+    assert entry.slice(start="2024-12-07") == []
+
+
+def test_slice_daily_truncates_bounds_to_dates():
+    entry = daily_entry()
+    bars = entry.slice(start="2024-12-04T23:00:00", end="2024-12-05 09:00")
+    assert [bar["date"] for bar in bars] == ["2024-12-05", "2024-12-04"]
+
+
+def test_slice_rejects_compact_dates():
+    with pytest.raises(ValueError):
+        daily_entry().slice(since="20241206")
+
+
+def test_sliced_responses_get_their_own_etag():
+    entry = intraday_entry()
+    full = series_headers(entry)
+    sliced = series_headers(entry, "2024-12-06", None, None)
+
+    assert full["ETag"] == f'"{entry.etag}"'
+    assert sliced["ETag"] != full["ETag"]
+    assert series_headers(entry, "2024-12-06", None, None) == sliced
+    assert full["Last-Modified"] == "Thu, 01 Jan 1970 00:16:40 GMT"
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    ('"{etag}"', True),
+    ('W/"{etag}"', True),
+    ('"other", W/"{etag}"', True),
+    ("*", True),
+    ('"other"', False),
+])
+def test_if_none_match(if_none_match, expected):
+    headers = series_headers(intraday_entry())
+    tag = headers["ETag"].strip('"')
+    assert is_not_modified(headers, if_none_match.format(etag=tag), None) is expected
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    headers = series_headers(intraday_entry())
+    later = "Fri, 06 Dec 2030 00:00:00 GMT"
+    assert is_not_modified(headers, None, later) is True
+    assert is_not_modified(headers, '"other"', later) is False
+    assert is_not_modified(headers, None, "Thu, 01 Jan 1970 00:00:00 GMT") is False
+    assert is_not_modified(headers, None, "not a date") is False